@@ -2,7 +2,18 @@
 
 import streamlit as st
 from modules.auth import load_authenticator, save_config
-from modules.utils import page_setup, get_user_id
+from modules.utils import page_setup, get_current_user_id
+from modules.database import create_db_and_tables
+
+@st.cache_resource(show_spinner=False)
+def init_database():
+    """
+    Creates missing tables and migrates an existing database to the current
+    models. Cached so it runs once per server process, not on every rerun.
+    """
+    create_db_and_tables()
+
+init_database()
 
 # Initialize authenticator and config globally so they are accessible throughout the file
 authenticator, config = load_authenticator()
@@ -23,8 +34,8 @@ def main():
         st.success("You are successfully logged in.")
         st.info("Navigate to any page using the sidebar to manage your health.")
 
-        if 'user_db_id' not in st.session_state or st.session_state.get('user_db_id') is None:
-            st.session_state['user_db_id'] = get_user_id(st.session_state.get('username'))
+        # Resolve the user's database ID once; it is kept in session_state afterwards.
+        get_current_user_id()
 
     else:
         # If the user is NOT logged in, display the login and sign-up UI.
@@ -39,15 +50,20 @@ def main():
             st.error('Username/password is incorrect.')
         
         # We don't need a check for 'None' because the form is simply waiting for input.
+
+        # --- Sign Up Expander ---
+        # Only built while the login widget is shown, not on every rerun of a logged-in session.
+        if not st.session_state.get("authentication_status"):
+            with st.expander("Don't have an account? Sign Up"):
+                try:
+                    if authenticator.register_user(location='main'):
+                        st.success('User registered successfully! Please log in above to continue.')
+                        # save_config() also clears the cached config so the new
+                        # credentials are picked up on the next rerun.
+                        save_config(config)
+                except Exception as e:
+                    st.error(e)
         
-# --- Sign Up Expander ---
-with st.expander("Don't have an account? Sign Up"):
-    try:
-        if authenticator.register_user(location='main'):
-            st.success('User registered successfully! Please log in above to continue.')
-            save_config(config)
-    except Exception as e:
-        st.error(e)
 
 # --- Footer ---
 st.markdown("---")
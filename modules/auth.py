@@ -1,15 +1,32 @@
 # modules/auth.py (Corrected for new version)
 
+import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
-from yaml.loader import SafeLoader
+# Prefer the libyaml-backed C loader/dumper when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+@st.cache_data(show_spinner=False)
+def _read_config():
+    """
+    Reads and parses the config.yaml file into a dictionary.
+    Cached so the file is only parsed once per process; st.cache_data hands
+    each caller its own copy, so sessions never share the mutable dict.
+    """
+    with open('config.yaml') as file:
+        return yaml.load(file, Loader=SafeLoader)
 
 def load_authenticator():
     """
     Loads the authenticator object from the config.yaml file.
+    The authenticator is built on every run, because its constructor seeds the
+    per-session login state and renders the cookie manager; only the parsed
+    config is cached.
     """
-    with open('config.yaml') as file:
-        config = yaml.load(file, Loader=SafeLoader)
+    config = _read_config()
 
     # --- THIS IS THE PART THAT IS FIXED ---
     # The 'preauthorized' argument has been removed from this class initialization.
@@ -27,4 +44,7 @@ def save_config(config):
     Saves the updated configuration dictionary back to the config.yaml file.
     """
     with open('config.yaml', 'w') as file:
-        yaml.dump(config, file, default_flow_style=False)
\ No newline at end of file
+        yaml.dump(config, file, Dumper=SafeDumper, default_flow_style=False)
+
+    # Invalidate the cached config so the next rerun picks up the new file.
+    _read_config.clear()
@@ -1,16 +1,72 @@
 # modules/database.py
 
-import datetime
-from sqlalchemy import (create_engine, Column, Integer, String, DateTime, 
-                        ForeignKey, Text, Float)
-from sqlalchemy.orm import declarative_base, sessionmaker
+import os
+import re
+from sqlalchemy import (create_engine, event, Column, Integer, BigInteger, String, DateTime, 
+                        ForeignKey, Text, Float, Index, bindparam, select, update)
+from sqlalchemy.orm import declarative_base, sessionmaker, validates
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import func
 
 # --- DATABASE SETUP ---
 DATABASE_URL = "sqlite:///./health_manager.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Connection pool sizing; override with environment variables to match the
+# number of concurrent Streamlit sessions you expect.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 15))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 10))  # seconds to wait for a free connection
+
+# Engine options shared by the app's engine and Streamlit's SQL connection
+# (see modules.utils.get_db_connection), so both pool and tune SQLite the same way.
+# Plain values only, since st.connection hashes its arguments; the pool class is
+# passed separately (SQLAlchemy 2.x already pools file-based SQLite with QueuePool).
+ENGINE_OPTIONS = dict(
+    connect_args={"check_same_thread": False},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+)
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Applies the SQLite pragmas once for every new pooled connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.close()
+
+# A single pooled engine shared by the app and the reminder service, so
+# connections (and the SQLite -wal/-shm files) stay open across reruns.
+engine = create_engine(DATABASE_URL, poolclass=QueuePool, **ENGINE_OPTIONS)
+event.listen(engine, "connect", set_sqlite_pragmas)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# --- SCHEDULE PARSING ---
+# Matches clock times such as "08:00", "20:30", "8 AM", "9:15pm" or "8.30 pm".
+# The lookbehind stops the 12-hour form from starting mid-number ("8.30 pm" is not "30 pm").
+_SCHEDULE_TIME_RE = re.compile(r"(?<![\d.:])\b(\d{1,2})(?:[:.](\d{2}))?\s*([ap])\.?m\b|\b(\d{1,2}):\d{2}\b", re.IGNORECASE)
+
+def schedule_to_mask(schedule):
+    """
+    Converts a free-text medication schedule into a 24-bit mask of hours.
+    Bit h is set if the schedule mentions a time during hour h (0-23).
+    """
+    mask = 0
+    for hour_12, _, meridiem, hour_24 in _SCHEDULE_TIME_RE.findall(schedule or ""):
+        if hour_24:
+            hour = int(hour_24)
+        else:
+            hour = int(hour_12) % 12 + (12 if meridiem.lower() == "p" else 0)
+        if 0 <= hour < 24:
+            mask |= 1 << hour
+    return mask
+
 # --- DATABASE MODELS (TABLES) ---
 
 class User(Base):
@@ -26,8 +82,22 @@ class Medication(Base):
     name = Column(String, index=True, nullable=False)
     dosage = Column(String)
     schedule = Column(String)
+    # Hours of the day the medication is due, parsed from 'schedule' (bit h = hour h)
+    schedule_mask = Column(BigInteger, index=True, nullable=False, default=0)
     start_date = Column(DateTime)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Set by the reminder service so each scheduled hour is only emailed once
+    last_reminder_sent = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Covers the per-user medication list, ordered by name
+        Index("ix_med_owner_name", "owner_id", "name"),
+    )
+
+    @validates("schedule")
+    def _update_schedule_mask(self, key, schedule):
+        self.schedule_mask = schedule_to_mask(schedule)
+        return schedule
 
 class Document(Base):
     __tablename__ = "documents"
@@ -35,9 +105,16 @@ class Document(Base):
     original_filename = Column(String, nullable=False)
     storage_key = Column(String, unique=True, nullable=False)
     description = Column(String)
-    upload_date = Column(DateTime, default=datetime.datetime.utcnow)
+    # 'default' renders the same CURRENT_TIMESTAMP in the INSERT, for databases created
+    # before the column had a server default (SQLite can't add one to an existing column)
+    upload_date = Column(DateTime, default=func.now(), server_default=func.now(), nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
+    __table_args__ = (
+        # Covers the per-user document list, ordered by upload date
+        Index("ix_doc_owner_date", "owner_id", "upload_date"),
+    )
+
 class Appointment(Base):
     __tablename__ = "appointments"
     id = Column(Integer, primary_key=True, index=True)
@@ -47,6 +124,13 @@ class Appointment(Base):
     location = Column(String)
     notes = Column(Text)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Set by the reminder service so each appointment is only emailed once
+    last_reminder_sent = Column(DateTime, nullable=True, index=True)
+
+    __table_args__ = (
+        # Covers per-user date range scans (dashboard, reminders)
+        Index("ix_appt_owner_dt", "owner_id", "appointment_datetime"),
+    )
     
 class HealthVital(Base):
     __tablename__ = "health_vitals"
@@ -55,9 +139,61 @@ class HealthVital(Base):
     value1 = Column(Float, nullable=False)
     value2 = Column(Float, nullable=True)
     unit = Column(String)
-    record_date = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    record_date = Column(DateTime, default=func.now(), server_default=func.now(), nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
-# --- UTILITY FUNCTION TO CREATE TABLES ---
+    __table_args__ = (
+        # Covers the per-user vital type list and each type's series, ordered by date
+        Index("ix_vital_owner_type_date", "owner_id", "vital_type", "record_date"),
+    )
+
+# --- UTILITY FUNCTIONS TO CREATE AND MIGRATE TABLES ---
+
+# Columns added to tables after their first release. create_all() never alters
+# an existing table, so these are added by _migrate_schema() when missing.
+_ADDED_COLUMNS = {
+    "medications": {
+        "schedule_mask": "BIGINT NOT NULL DEFAULT 0",
+        "last_reminder_sent": "DATETIME",
+    },
+    "appointments": {
+        "last_reminder_sent": "DATETIME",
+    },
+}
+
+def _migrate_schema(connection):
+    """
+    Brings an existing database up to date with the models. Safe to run on
+    every start: it only adds missing columns and indexes, and only backfills
+    medications whose schedule_mask hasn't been computed yet.
+    """
+    for table_name, columns in _ADDED_COLUMNS.items():
+        existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table_name})")}
+        for column_name, column_ddl in columns.items():
+            if column_name not in existing:
+                connection.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_ddl}")
+
+    # Equivalent to CREATE INDEX IF NOT EXISTS for every index declared on the models
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+    # Rows saved before schedule_mask existed (or without a parseable time) are still 0
+    rows = connection.execute(
+        select(Medication.id, Medication.schedule)
+        .where(Medication.schedule_mask == 0, Medication.schedule.isnot(None))
+    ).all()
+    masks = [{"med_id": row.id, "mask": schedule_to_mask(row.schedule)} for row in rows]
+    masks = [params for params in masks if params["mask"]]
+    if masks:
+        connection.execute(
+            update(Medication)
+            .where(Medication.id == bindparam("med_id"))
+            .values(schedule_mask=bindparam("mask")),
+            masks,
+        )
+
 def create_db_and_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        _migrate_schema(connection)
\ No newline at end of file
@@ -15,14 +15,15 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import time
+from collections import defaultdict
 from datetime import datetime, timedelta
 
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.blocking import BlockingScheduler
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import or_, update
 
-# Import the database models from our main application
-from modules.database import Base, User, Appointment, Medication
+# Import the shared engine, session factory and database models from our main application
+from modules.database import engine, SessionLocal, User, Appointment, Medication, create_db_and_tables
 
 # ==============================================================================
 # 2. CONFIGURATION AND SETUP
@@ -34,23 +35,17 @@ SENDER_EMAIL = os.environ.get("EMAIL_SENDER")
 SENDER_PASSWORD = os.environ.get("EMAIL_PASSWORD")
 SMTP_SERVER = "smtp.gmail.com"  # Using Gmail as an example
 SMTP_PORT = 465  # For SSL
-
-# --- Database Connection ---
-# Must be the exact same DATABASE_URL as your main Streamlit app
-DATABASE_URL = "sqlite:///./health_manager.db"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+MAX_RECIPIENTS_PER_MESSAGE = 100  # BCC recipients per SMTP transaction
 
 # ==============================================================================
 # 3. NOTIFICATION LOGIC
 # ==============================================================================
 
-def send_email_reminder(recipient_email, subject, body):
-    """Sends an email using SMTP."""
-    if not all([SENDER_EMAIL, SENDER_PASSWORD]):
-        print("ERROR: Email credentials not set in environment variables. Cannot send email.")
-        return
-
+def send_email_reminder(server, recipient_email, subject, body):
+    """
+    Sends an email over an already connected and logged-in SMTP server.
+    Returns True if the message was accepted, False otherwise.
+    """
     message = MIMEMultipart()
     message["From"] = SENDER_EMAIL
     message["To"] = recipient_email
@@ -59,12 +54,41 @@ def send_email_reminder(recipient_email, subject, body):
 
     try:
         print(f"Attempting to send email to {recipient_email}...")
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
-            server.login(SENDER_EMAIL, SENDER_PASSWORD)
-            server.sendmail(SENDER_EMAIL, recipient_email, message.as_string())
+        server.sendmail(SENDER_EMAIL, recipient_email, message.as_string())
         print(f"Email sent successfully to {recipient_email}!")
+        return True
     except Exception as e:
         print(f"Failed to send email to {recipient_email}. Error: {e}")
+        return False
+
+def send_bulk_email_reminder(server, recipient_emails, subject, body):
+    """
+    Sends the same email to many recipients over an already connected SMTP server.
+    Recipients are BCC'd in chunks of MAX_RECIPIENTS_PER_MESSAGE, so they never see
+    each other's addresses and each chunk costs a single SMTP transaction.
+    Returns the set of recipient addresses the server accepted.
+    """
+    message = MIMEMultipart()
+    message["From"] = SENDER_EMAIL
+    message["To"] = SENDER_EMAIL
+    message["Subject"] = subject
+    message.attach(MIMEText(body, "plain"))
+    message_str = message.as_string()
+    delivered = set()
+
+    for start in range(0, len(recipient_emails), MAX_RECIPIENTS_PER_MESSAGE):
+        chunk = recipient_emails[start:start + MAX_RECIPIENTS_PER_MESSAGE]
+        try:
+            print(f"Attempting to send email to {len(chunk)} recipient(s)...")
+            refused = server.sendmail(SENDER_EMAIL, chunk, message_str)
+            for recipient_email, error in refused.items():
+                print(f"Failed to send email to {recipient_email}. Error: {error}")
+            print(f"Email sent successfully to {len(chunk) - len(refused)} recipient(s)!")
+            delivered.update(email for email in chunk if email not in refused)
+        except Exception as e:
+            print(f"Failed to send email to {', '.join(chunk)}. Error: {e}")
+
+    return delivered
 
 # ==============================================================================
 # 4. THE MAIN REMINDER JOB
@@ -73,60 +97,116 @@ def send_email_reminder(recipient_email, subject, body):
 def check_for_reminders():
     """The main job that queries the DB and triggers notifications."""
     print(f"--- Running reminder check at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---")
-    db = SessionLocal()
+    if not all([SENDER_EMAIL, SENDER_PASSWORD]):
+        print("ERROR: Email credentials not set in environment variables. Cannot send email.")
+        return
+
+    # The session is committed (or rolled back) and closed when the block exits,
+    # so its connection is always handed back to the pool at the end of each tick.
     try:
-        # --- Check for upcoming appointments (e.g., within the next 24 hours) ---
-        now = datetime.utcnow()
-        reminder_window_end = now + timedelta(hours=24)
+        with SessionLocal.begin() as db:
+            # --- Check for upcoming appointments (e.g., within the next 24 hours) ---
+            now = datetime.utcnow()
+            reminder_window_end = now + timedelta(hours=24)
         
-        upcoming_appointments = (
-            db.query(Appointment, User)
-            .join(User, Appointment.owner_id == User.id)
-            .filter(Appointment.appointment_datetime.between(now, reminder_window_end))
-            .all()
-        )
-
-        for appointment, user in upcoming_appointments:
-            subject = "Upcoming Appointment Reminder"
-            body = (
-                f"Hi {user.name},\n\n"
-                f"This is a reminder for your upcoming appointment:\n"
-                f"Doctor: {appointment.doctor_name} ({appointment.specialty})\n"
-                f"Date & Time: {appointment.appointment_datetime.strftime('%A, %B %d, %Y at %I:%M %p')}\n"
-                f"Location: {appointment.location}\n\n"
-                f"Have a great day!\nYour Personal Health Manager"
+            upcoming_appointments = (
+                db.query(
+                    Appointment.id, Appointment.doctor_name, Appointment.specialty,
+                    Appointment.appointment_datetime, Appointment.location,
+                    User.name, User.email,
+                )
+                .join(User, Appointment.owner_id == User.id)
+                .filter(Appointment.appointment_datetime.between(now, reminder_window_end))
+                .filter(or_(
+                    Appointment.last_reminder_sent.is_(None),
+                    Appointment.last_reminder_sent < now - timedelta(hours=24),
+                ))
+                .all()
             )
-            send_email_reminder(user.email, subject, body)
-            # NOTE: In a real app, you'd mark this reminder as 'sent' in the DB
-            # to avoid sending it again on the next check.
-
-        # --- Check for medication reminders (a simplified approach) ---
-        # This simple check triggers for medications scheduled on the current hour.
-        # A real-world app would need a more robust schedule parsing logic.
-        current_hour_str = datetime.now().strftime("%H:00")
+
+            # --- Check for medication reminders ---
+            # Triggers for medications scheduled during the current hour, using the
+            # hour bitmask that is parsed from the schedule text when it is saved.
+            local_now = datetime.now()
+            current_hour = local_now.hour
+            current_hour_start = local_now.replace(minute=0, second=0, microsecond=0)
         
-        meds_due = (
-            db.query(Medication, User)
-            .join(User, Medication.owner_id == User.id)
-            .filter(Medication.schedule.like(f"%{current_hour_str}%")) # Simple text match
-            .all()
-        )
-
-        for medication, user in meds_due:
-             subject = "Medication Reminder"
-             body = (
-                f"Hi {user.name},\n\n"
-                f"It's time to take your medication:\n"
-                f"Medication: {medication.name}\n"
-                f"Dosage: {medication.dosage}\n"
-                f"Schedule Info: {medication.schedule}\n\n"
-                f"Stay healthy!\nYour Personal Health Manager"
+            meds_due = (
+                db.query(Medication.id, Medication.name, Medication.dosage, Medication.schedule, User.email)
+                .join(User, Medication.owner_id == User.id)
+                .filter(Medication.schedule_mask.op('&')(1 << current_hour) != 0)
+                .filter(or_(
+                    Medication.last_reminder_sent.is_(None),
+                    Medication.last_reminder_sent < current_hour_start,
+                ))
+                .all()
             )
-             send_email_reminder(user.email, subject, body)
+
+            if not upcoming_appointments and not meds_due:
+                print("No reminders due.")
+                return
+
+            # Open a single SMTP connection and log in once for the whole run,
+            # instead of reconnecting for every recipient. The connection is opened
+            # in the 'with' so it is closed even if the login fails.
+            sent_appointment_ids = []
+            sent_medication_ids = []
+
+            try:
+                with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
+                    server.login(SENDER_EMAIL, SENDER_PASSWORD)
+                    for appointment in upcoming_appointments:
+                        subject = "Upcoming Appointment Reminder"
+                        body = (
+                            f"Hi {appointment.name},\n\n"
+                            f"This is a reminder for your upcoming appointment:\n"
+                            f"Doctor: {appointment.doctor_name} ({appointment.specialty})\n"
+                            f"Date & Time: {appointment.appointment_datetime.strftime('%A, %B %d, %Y at %I:%M %p')}\n"
+                            f"Location: {appointment.location}\n\n"
+                            f"Have a great day!\nYour Personal Health Manager"
+                        )
+                        if send_email_reminder(server, appointment.email, subject, body):
+                            sent_appointment_ids.append(appointment.id)
+
+                    # Medication reminders aren't personalized, so users taking the same
+                    # medication on the same schedule share one message.
+                    med_groups = defaultdict(list)
+                    for medication in meds_due:
+                        med_groups[(medication.name, medication.dosage, medication.schedule)].append(medication)
+
+                    for (name, dosage, schedule), medications in med_groups.items():
+                        subject = "Medication Reminder"
+                        body = (
+                            f"Hi there,\n\n"
+                            f"It's time to take your medication:\n"
+                            f"Medication: {name}\n"
+                            f"Dosage: {dosage}\n"
+                            f"Schedule Info: {schedule}\n\n"
+                            f"Stay healthy!\nYour Personal Health Manager"
+                        )
+                        recipient_emails = list({medication.email for medication in medications})
+                        delivered = send_bulk_email_reminder(server, recipient_emails, subject, body)
+                        sent_medication_ids.extend(medication.id for medication in medications if medication.email in delivered)
+            except Exception as e:
+                print(f"Failed to send reminders over SMTP. Error: {e}")
+
+            # Mark everything that was sent with one bulk UPDATE per table, so the
+            # next run (10 minutes later) doesn't send the same reminders again.
+            if sent_appointment_ids:
+                db.execute(
+                    update(Appointment)
+                    .where(Appointment.id.in_(sent_appointment_ids))
+                    .values(last_reminder_sent=now)
+                )
+            if sent_medication_ids:
+                db.execute(
+                    update(Medication)
+                    .where(Medication.id.in_(sent_medication_ids))
+                    .values(last_reminder_sent=local_now)
+                )
 
     finally:
-        db.close()
-    print("--- Reminder check finished ---")
+        print("--- Reminder check finished ---")
 
 # ==============================================================================
 # 5. SCHEDULER EXECUTION
@@ -134,13 +214,33 @@ def check_for_reminders():
 
 if __name__ == "__main__":
     print("Starting Reminder Service...")
+    # Bring an existing database up to date before the first query uses new columns
+    create_db_and_tables()
     # The 'BlockingScheduler' will run in the foreground and block the terminal.
-    scheduler = BlockingScheduler()
+    # Jobs are persisted in the app's database, so the job's next run time
+    # survives restarts of this service.
+    jobstore = SQLAlchemyJobStore(engine=engine)
+    scheduler = BlockingScheduler(jobstores={'default': jobstore})
+
+    # Look up the job stored by a previous run. The scheduler starts its job
+    # stores again in start(), which is harmless (the table is created only if missing).
+    jobstore.start(scheduler, 'default')
+    stored_job = jobstore.lookup_job('reminder_check')
     
     # Schedule the 'check_for_reminders' job to run every 10 minutes.
     # For testing, you can change 'minutes' to 'seconds=30'
-    scheduler.add_job(check_for_reminders, 'interval', minutes=10)
-    
+    job_options = dict(
+        id='reminder_check',
+        replace_existing=True,  # Don't register a duplicate job on restart
+        coalesce=True,          # Collapse several missed runs into one
+        misfire_grace_time=300,
+        max_instances=1,
+    )
+    if stored_job is not None:
+        # Keep the stored next run time instead of pushing it back 10 minutes on every restart
+        job_options['next_run_time'] = stored_job.next_run_time
+    scheduler.add_job(check_for_reminders, 'interval', minutes=10, **job_options)
+
     # Run the check once immediately on startup
     check_for_reminders()
 
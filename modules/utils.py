@@ -9,7 +9,10 @@ Functions:
 - page_setup(): Configures the basic Streamlit page settings like title, icon, and layout.
 - check_login(): A security check to ensure a user is logged in before accessing a page.
 - get_db_session(): A context manager to handle database sessions reliably.
+- get_db_connection(): Streamlit's cached SQL connection, used for read-only queries.
+- load_dashboard_data(user_id, start, end): Cached dashboard summary, cleared by pages that change it.
 - get_user_id(username): Fetches the user's database ID based on their username.
+- get_current_user_id(): Returns the logged-in user's database ID, stored once per session.
 """
 
 # ==============================================================================
@@ -17,16 +20,24 @@ Functions:
 # ==============================================================================
 
 import streamlit as st
+import pandas as pd
 from PIL import Image
 from contextlib import contextmanager
+from sqlalchemy import event, text
 
 # Import database components needed for utility functions
-from .database import SessionLocal, User
+from .database import DATABASE_URL, ENGINE_OPTIONS, SessionLocal, User, set_sqlite_pragmas
 
 # ==============================================================================
 # 2. PAGE AND UI UTILITIES
 # ==============================================================================
 
+@st.cache_resource
+def _load_logo():
+    """Loads and decodes the sidebar logo once per process."""
+    return Image.open('assets/logo.png')
+
+
 def page_setup():
     """
     Sets up the Streamlit page configuration, logo, and title.
@@ -42,7 +53,7 @@ def page_setup():
     # Add a logo to the sidebar.
     # The 'try-except' block prevents the app from crashing if the logo file is not found.
     try:
-        logo = Image.open('assets/logo.png')
+        logo = _load_logo()
         st.sidebar.image(logo, width=150)
     except FileNotFoundError:
         st.sidebar.warning("Logo file 'assets/logo.png' not found.")
@@ -70,6 +81,8 @@ def get_db_session():
     """
     A context manager for safely handling database sessions.
     It ensures that the database session is always closed, even if errors occur.
+    Sessions are drawn from the single pooled engine created when modules.database
+    is first imported, so no engine or pool is rebuilt on Streamlit reruns.
 
     Yields:
         db (Session): The SQLAlchemy database session.
@@ -87,6 +100,71 @@ def get_db_session():
         db.close()
 
 
+def get_db_connection():
+    """
+    Returns Streamlit's SQL connection to the health database.
+
+    Streamlit builds its own engine for the connection, so it is given the same
+    pool options and SQLite pragmas as the shared engine in modules.database.
+    Reads go through named @st.cache_data functions that query conn.session,
+    so each page can clear just its own cached results after a write.
+
+    Example Usage:
+        with get_db_connection().session as session:
+            df = pd.read_sql(text("SELECT * FROM documents WHERE owner_id = :uid"),
+                             session.connection(), params={"uid": user_id})
+    """
+    conn = st.connection("health_db", type="sql", url=DATABASE_URL, **ENGINE_OPTIONS)
+    if not event.contains(conn.engine, "connect", set_sqlite_pragmas):
+        event.listen(conn.engine, "connect", set_sqlite_pragmas)
+    return conn
+
+
+# Appointments in the next 7 days and the medication count come back from a single
+# query: the user row is LEFT JOINed to their upcoming appointments (so there is
+# always at least one row) and the count comes from a correlated subquery.
+DASHBOARD_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM medications m WHERE m.owner_id = u.id) AS medication_count,
+        a.doctor_name, a.specialty, a.appointment_datetime
+    FROM users u
+    LEFT JOIN appointments a
+        ON a.owner_id = u.id AND a.appointment_datetime BETWEEN :start AND :end
+    WHERE u.id = :uid
+    ORDER BY a.appointment_datetime ASC
+"""
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_dashboard_data(user_id: int, start: str, end: str):
+    """
+    Returns the dashboard's upcoming appointments and medication count as a DataFrame.
+    Kept here rather than in the Dashboard page so the Medications and Appointments
+    pages can clear it (load_dashboard_data.clear()) after they change the data.
+    """
+    with get_db_connection().session as session:
+        return pd.read_sql(
+            text(DASHBOARD_QUERY),
+            session.connection(),
+            params={"uid": user_id, "start": start, "end": end},
+            parse_dates=["appointment_datetime"],
+        )
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _lookup_user_id(username: str):
+    """
+    Looks up the database ID for a username without any side effects.
+    Cached so that page reruns don't repeat the SELECT on the users table.
+
+    Returns:
+        int or None: The user's ID, or None if no record exists.
+    """
+    with get_db_session() as db:
+        user = db.query(User.id).filter(User.username == username).first()
+        return user.id if user else None
+
+
 def get_user_id(username: str):
     """
     Fetches the database ID for a given username.
@@ -104,30 +182,46 @@ def get_user_id(username: str):
     if not username:
         return None
 
+    # If the user exists in our DB, return their (cached) ID
+    user_id = _lookup_user_id(username)
+    if user_id is not None:
+        return user_id
+
     with get_db_session() as db:
-        user = db.query(User).filter(User.username == username).first()
+        # If user exists in authenticator but not in our DB (e.g., first login after DB reset)
+        # we should create a record for them.
+        st.info("First-time login detected. Creating your user profile in the database.")
         
-        # If the user exists in our DB, return their ID
-        if user:
-            return user.id
-        else:
-            # If user exists in authenticator but not in our DB (e.g., first login after DB reset)
-            # we should create a record for them.
-            st.info("First-time login detected. Creating your user profile in the database.")
-            
-            # We get the user details from session_state, which is populated by the authenticator
-            try:
-                new_user = User(
-                    username=st.session_state["username"],
-                    name=st.session_state["name"],
-                    email=st.session_state["email"] # Assumes email is returned by authenticator
-                )
-                db.add(new_user)
-                db.commit()
-                db.refresh(new_user) # Refresh to get the newly created ID
-                st.success("User profile created successfully.")
-                return new_user.id
-            except Exception as e:
-                st.error(f"Error creating user profile in database: {e}")
-                db.rollback() # Rollback changes if an error occurs
-                return None
\ No newline at end of file
+        # We get the user details from session_state, which is populated by the authenticator
+        try:
+            new_user = User(
+                username=st.session_state["username"],
+                name=st.session_state["name"],
+                email=st.session_state["email"] # Assumes email is returned by authenticator
+            )
+            db.add(new_user)
+            db.commit()
+            db.refresh(new_user) # Refresh to get the newly created ID
+            _lookup_user_id.clear() # Drop the cached "not found" result
+            st.success("User profile created successfully.")
+            return new_user.id
+        except Exception as e:
+            st.error(f"Error creating user profile in database: {e}")
+            db.rollback() # Rollback changes if an error occurs
+            return None
+
+
+def get_current_user_id():
+    """
+    Returns the database ID of the logged-in user.
+
+    The ID is looked up once and kept in st.session_state['user_db_id'], so
+    later reruns and page switches don't need to query the database again.
+
+    Returns:
+        int or None: The integer ID of the user, or None if it cannot be resolved.
+    """
+    user_id = st.session_state.get("user_db_id")
+    if user_id is None:
+        user_id = st.session_state["user_db_id"] = get_user_id(st.session_state.get("username"))
+    return user_id
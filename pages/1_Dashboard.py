@@ -15,10 +15,7 @@ import streamlit as st
 from datetime import datetime, timedelta
 
 # Import utility functions for page setup and login check
-from modules.utils import page_setup, check_login, get_db_session
-
-# Import database models to query for dashboard data
-from modules.database import Appointment, Medication
+from modules.utils import page_setup, check_login, get_current_user_id, load_dashboard_data
 
 # ==============================================================================
 # 2. PAGE SETUP AND AUTHENTICATION CHECK
@@ -39,30 +36,28 @@ st.info("This is your central hub for managing your health. Here you'll find qui
 st.divider()
 
 # --- Fetch Data for the Dashboard ---
-# We use a single database session for all queries on this page.
-user_id = st.session_state.get("user_db_id")
+# Appointments in the next 7 days and the medication count come back from a single
+# cached query (see load_dashboard_data); it is cleared when those pages save changes.
+
+user_id = get_current_user_id()
 upcoming_appointments = []
 active_medications_count = 0
 
 if user_id:
-    with get_db_session() as db:
-        # Query for appointments in the next 7 days
-        now = datetime.utcnow()
-        next_week = now + timedelta(days=7)
-        upcoming_appointments = (
-            db.query(Appointment)
-            .filter(Appointment.owner_id == user_id)
-            .filter(Appointment.appointment_datetime.between(now, next_week))
-            .order_by(Appointment.appointment_datetime.asc())
-            .all()
-        )
-
-        # Query for the count of active medications
-        active_medications_count = (
-            db.query(Medication)
-            .filter(Medication.owner_id == user_id)
-            .count() # A simple count for now
-        )
+    # Round to the minute so reruns within the cache TTL reuse the same query result
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    next_week = now + timedelta(days=7)
+    rows = load_dashboard_data(
+        user_id,
+        now.strftime("%Y-%m-%d %H:%M:%S"),
+        next_week.strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+    upcoming_df = rows.dropna(subset=["appointment_datetime"])
+    # Format all dates in one vectorized pass instead of inside the render loop
+    upcoming_df = upcoming_df.assign(when_str=upcoming_df["appointment_datetime"].dt.strftime("%A, %b %d at %I:%M %p"))
+    upcoming_appointments = list(upcoming_df.itertuples(index=False))
+    active_medications_count = int(rows["medication_count"].iloc[0]) if not rows.empty else 0
 else:
     st.error("Could not retrieve user data. Please try logging in again.")
 
@@ -76,9 +71,7 @@ with col1:
         
         if upcoming_appointments:
             for appt in upcoming_appointments:
-                # Format the datetime object for display
-                appt_date_str = appt.appointment_datetime.strftime("%A, %b %d at %I:%M %p")
-                st.markdown(f"- **{appt.doctor_name}** ({appt.specialty}) on **{appt_date_str}**")
+                st.markdown(f"- **{appt.doctor_name}** ({appt.specialty}) on **{appt.when_str}**")
         else:
             st.success("You have no appointments in the next 7 days.")
         
@@ -9,13 +9,16 @@ Files are securely stored in an AWS S3 bucket, and metadata is saved in the data
 # 1. IMPORTS
 # ==============================================================================
 import streamlit as st
-import boto3
+import pandas as pd
 import os
 import time
-from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import select
+# boto3/botocore are imported lazily below; they are slow to import and only
+# needed once this page is actually opened.
 
 # Import utility functions and database models
-from modules.utils import page_setup, check_login, get_db_session, get_user_id
+from modules.utils import page_setup, check_login, get_db_session, get_db_connection, get_current_user_id
 from modules.database import Document
 
 # ==============================================================================
@@ -31,10 +34,16 @@ check_login()
 # Fetch S3 configuration from environment variables
 S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME")
 
+@st.cache_resource
+def _get_s3_client():
+    """Builds the S3 client once per process."""
+    import boto3
+    # Boto3 will automatically use the credentials from environment variables
+    return boto3.client('s3')
+
 # Initialize S3 client
-# Boto3 will automatically use the credentials from environment variables
 try:
-    s3_client = boto3.client('s3')
+    s3_client = _get_s3_client()
 except Exception as e:
     st.error(f"Failed to initialize S3 client. Please check your AWS credentials and region setup. Error: {e}")
     st.stop()
@@ -45,11 +54,41 @@ if not S3_BUCKET_NAME:
     st.stop()
 
 # Get the current user's database ID
-user_id = st.session_state.get("user_db_id")
+user_id = get_current_user_id()
 if not user_id:
     st.error("User not properly logged in. Cannot load documents.")
     st.stop()
 
+# --- Cached data helpers ---
+@st.cache_data(ttl=60, show_spinner=False)
+def load_documents(user_id):
+    """
+    Returns the user's documents as a DataFrame, newest first.
+    Cached across reruns; cleared (load_documents.clear()) after an upload or delete.
+    """
+    # Selecting the typed columns lets SQLAlchemy parse upload_date in both stored
+    # formats (with microseconds from older rows, without from CURRENT_TIMESTAMP).
+    stmt = (
+        select(
+            Document.id, Document.original_filename, Document.storage_key,
+            Document.description, Document.upload_date,
+        )
+        .where(Document.owner_id == user_id)
+        .order_by(Document.upload_date.desc())
+    )
+    with get_db_connection().session as session:
+        return pd.read_sql(stmt, session.connection())
+
+# Keyed by storage key, so it never needs clearing: new uploads get new keys.
+@st.cache_data(ttl=240, show_spinner=False)
+def _presign(storage_key):
+    """Returns a download URL for an S3 object, cached for less than its 5 minute lifetime."""
+    return s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': S3_BUCKET_NAME, 'Key': storage_key},
+        ExpiresIn=300  # URL expires in 300 seconds (5 minutes)
+    )
+
 # ==============================================================================
 # 4. UPLOAD FUNCTIONALITY
 # ==============================================================================
@@ -67,32 +106,48 @@ with st.form("document_upload_form", clear_on_submit=True):
     submitted = st.form_submit_button("Upload and Save")
 
     if submitted and uploaded_files:
+        from botocore.exceptions import ClientError
+
         with st.spinner("Uploading files..."):
-            for file in uploaded_files:
-                # Generate a unique, secure key for the S3 object
-                # Format: username/timestamp-filename
-                username = st.session_state.get("username", "unknown_user")
-                storage_key = f"{username}/{int(time.time())}-{file.name}"
+            new_docs = []
+            # Generate a unique, secure key for each S3 object
+            # Format: username/timestamp-filename
+            username = st.session_state.get("username", "unknown_user")
+            upload_time = int(time.time())
+
+            # Upload files to S3 in parallel; boto3 clients are thread-safe.
+            # Streamlit calls (st.error) stay on the main thread below.
+            with ThreadPoolExecutor(max_workers=min(8, len(uploaded_files))) as executor:
+                futures = {}
+                for file in uploaded_files:
+                    storage_key = f"{username}/{upload_time}-{file.name}"
+                    future = executor.submit(s3_client.upload_fileobj, file, S3_BUCKET_NAME, storage_key)
+                    futures[future] = (file, storage_key)
+
+                for future in as_completed(futures):
+                    file, storage_key = futures[future]
+                    try:
+                        future.result()
+                        new_docs.append({
+                            "original_filename": file.name,
+                            "storage_key": storage_key,
+                            "description": description,
+                            "owner_id": user_id,
+                        })
+                    except ClientError as e:
+                        st.error(f"Failed to upload {file.name} to S3. Error: {e}")
+                    except Exception as e:
+                        st.error(f"An error occurred while uploading {file.name}. Error: {e}")
 
+            # Save metadata for all uploaded files in a single transaction
+            if new_docs:
                 try:
-                    # Upload file to S3
-                    s3_client.upload_fileobj(file, S3_BUCKET_NAME, storage_key)
-
-                    # Save metadata to the database
                     with get_db_session() as db:
-                        new_doc = Document(
-                            original_filename=file.name,
-                            storage_key=storage_key,
-                            description=description,
-                            owner_id=user_id
-                        )
-                        db.add(new_doc)
+                        db.bulk_insert_mappings(Document, new_docs)
                         db.commit()
-
-                except ClientError as e:
-                    st.error(f"Failed to upload {file.name} to S3. Error: {e}")
                 except Exception as e:
-                    st.error(f"An error occurred while saving {file.name}. Error: {e}")
+                    st.error(f"An error occurred while saving the document details. Error: {e}")
+                load_documents.clear() # Refresh the cached document list
             
         st.success("All files uploaded successfully!")
         st.rerun() # Rerun the script to show the new documents in the list below
@@ -103,47 +158,79 @@ with st.form("document_upload_form", clear_on_submit=True):
 st.divider()
 st.subheader("Your Uploaded Documents")
 
-with get_db_session() as db:
-    user_docs = db.query(Document).filter(Document.owner_id == user_id).order_by(Document.upload_date.desc()).all()
+docs_df = load_documents(user_id)
+
+def _download_url(storage_key):
+    """Returns a cached pre-signed URL, or None if one could not be generated."""
+    try:
+        return _presign(storage_key)
+    except Exception:
+        return None
 
-if not user_docs:
+if docs_df.empty:
     st.info("You have not uploaded any documents yet. Use the form above to get started.")
 else:
-    for doc in user_docs:
-        with st.container(border=True):
-            col1, col2, col3 = st.columns([4, 1, 1])
-            with col1:
-                st.markdown(f"**{doc.original_filename}**")
-                st.caption(f"Description: {doc.description}" if doc.description else "No description")
-                st.caption(f"Uploaded on: {doc.upload_date.strftime('%Y-%m-%d %H:%M')}")
-
-            with col2:
-                # --- Download Button ---
-                try:
-                    # Generate a pre-signed URL that is valid for 1 minute
-                    download_url = s3_client.generate_presigned_url(
-                        'get_object',
-                        Params={'Bucket': S3_BUCKET_NAME, 'Key': doc.storage_key},
-                        ExpiresIn=300  # URL expires in 300 seconds (5 minutes)
+    docs_df["download_url"] = docs_df["storage_key"].map(_download_url)
+    if docs_df["download_url"].isna().any():
+        st.error("Could not generate download links for some documents.")
+
+    # One table widget for all documents, with a download link column and row
+    # selection for deletion, instead of a container, columns and buttons per row.
+    event = st.dataframe(
+        docs_df,
+        column_order=["original_filename", "description", "upload_date", "download_url"],
+        column_config={
+            "original_filename": st.column_config.TextColumn("Document"),
+            "description": st.column_config.TextColumn("Description"),
+            "upload_date": st.column_config.DatetimeColumn("Uploaded On", format="YYYY-MM-DD HH:mm"),
+            "download_url": st.column_config.LinkColumn("Download", display_text="⬇️ Download"),
+        },
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key="doc_table",
+    )
+    selected_docs = docs_df.iloc[event.selection.rows].to_dict("records")
+
+    # --- Delete Button ---
+    # All selected documents are removed with one S3 call and one SQL statement.
+    if st.button(f"🗑️ Delete Selected ({len(selected_docs)})", type="primary", disabled=not selected_docs):
+        try:
+            # 1. Delete from S3 (up to 1000 keys per request). delete_objects reports
+            # per-key failures in 'Errors' instead of raising, so collect what was deleted.
+            keys = [doc['storage_key'] for doc in selected_docs]
+            deleted_keys = set()
+            failed_keys = {}
+            for start in range(0, len(keys), 1000):
+                response = s3_client.delete_objects(
+                    Bucket=S3_BUCKET_NAME,
+                    Delete={'Objects': [{'Key': key} for key in keys[start:start + 1000]]}
+                )
+                deleted_keys.update(obj['Key'] for obj in response.get('Deleted', []))
+                failed_keys.update((err['Key'], err.get('Message', err.get('Code'))) for err in response.get('Errors', []))
+            
+            # 2. Delete from Database, only for the files that are gone from S3
+            deleted_docs = [doc for doc in selected_docs if doc['storage_key'] in deleted_keys]
+            ids = [doc['id'] for doc in deleted_docs]
+            if ids:
+                with get_db_session() as db_session:
+                    (
+                        db_session.query(Document)
+                        .filter(Document.owner_id == user_id, Document.id.in_(ids))
+                        .delete(synchronize_session=False)
                     )
-                    st.link_button("⬇️ Download", url=download_url)
-                except Exception as e:
-                    st.error("Could not generate download link.")
+                    db_session.commit()
+            load_documents.clear() # Refresh the cached document list
             
-            with col3:
-                # --- Delete Button ---
-                if st.button("🗑️ Delete", key=f"delete_{doc.id}", type="primary"):
-                    try:
-                        # 1. Delete from S3
-                        s3_client.delete_object(Bucket=S3_BUCKET_NAME, Key=doc.storage_key)
-                        
-                        # 2. Delete from Database
-                        with get_db_session() as db_session:
-                            doc_to_delete = db_session.query(Document).filter(Document.id == doc.id).first()
-                            db_session.delete(doc_to_delete)
-                            db_session.commit()
-                        
-                        st.success(f"Deleted '{doc.original_filename}' successfully.")
-                        st.rerun() # Refresh the page to update the list
-                    except Exception as e:
-                        st.error(f"Failed to delete file. Error: {e}")
\ No newline at end of file
+            if deleted_docs:
+                st.success(f"Deleted {len(deleted_docs)} document(s) successfully.")
+            if failed_keys:
+                # Keep these rows: their files are still in S3. No rerun, so the error stays visible.
+                failed_names = [doc['original_filename'] for doc in selected_docs if doc['storage_key'] in failed_keys]
+                st.error(f"Failed to delete {len(failed_names)} document(s) from storage: {', '.join(failed_names)}. "
+                         f"Error: {next(iter(failed_keys.values()))}")
+            else:
+                st.rerun() # Refresh the page to update the list
+        except Exception as e:
+            st.error(f"Failed to delete files. Error: {e}")
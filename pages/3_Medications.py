@@ -1,21 +1,43 @@
 # pages/3_Medications.py
 
 import streamlit as st
+import pandas as pd
 from datetime import datetime
+from sqlalchemy import update, delete
 
 # Import utility functions and database models
-from modules.utils import page_setup, check_login, get_db_session
-from modules.database import Medication
+from modules.utils import page_setup, check_login, get_db_session, get_current_user_id, load_dashboard_data
+from modules.database import Medication, schedule_to_mask
 
 page_setup()
 check_login()
 
 # Get the current user's database ID
-user_id = st.session_state.get("user_db_id")
+user_id = get_current_user_id()
 if not user_id:
     st.error("User not properly logged in. Cannot load medication data.")
     st.stop()
 
+@st.cache_data(ttl=300, show_spinner=False)
+def load_user_meds(user_id):
+    """
+    Returns the user's medications as plain dicts, ordered by name.
+    Cached across reruns; cleared whenever a medication is added, edited or deleted.
+    """
+    with get_db_session() as db:
+        # Select only the columns the list needs instead of hydrating full ORM objects
+        rows = (
+            db.query(Medication.id, Medication.name, Medication.dosage, Medication.schedule, Medication.start_date)
+            .filter(Medication.owner_id == user_id)
+            .order_by(Medication.name)
+            .all()
+        )
+        return [row._asdict() for row in rows]
+
+def clear_medication_caches():
+    load_user_meds.clear()
+    load_dashboard_data.clear()
+
 # ==============================================================================
 # 3. ADD NEW MEDICATION (CREATE)
 # ==============================================================================
@@ -27,7 +49,8 @@ with st.expander("➕ Add a New Medication"):
         st.subheader("New Medication Details")
         med_name = st.text_input("Medication Name", placeholder="e.g., Lisinopril")
         med_dosage = st.text_input("Dosage", placeholder="e.g., 10mg")
-        med_schedule = st.text_input("Schedule", placeholder="e.g., Once daily in the morning")
+        med_schedule = st.text_input("Schedule", placeholder="e.g., Once daily at 08:00",
+                                     help="Include times like 08:00 or 8 PM to receive email reminders.")
         med_start_date = st.date_input("Start Date", value=datetime.today())
         
         submitted = st.form_submit_button("Save Medication")
@@ -46,6 +69,7 @@ with st.expander("➕ Add a New Medication"):
                     )
                     db.add(new_med)
                     db.commit()
+                    clear_medication_caches() # Refresh the cached medication list and dashboard
                 st.success(f"'{med_name}' has been added to your list.")
                 # No st.rerun() needed here, Streamlit will rerun after the form submission.
 
@@ -55,62 +79,85 @@ with st.expander("➕ Add a New Medication"):
 st.divider()
 st.subheader("Your Current Medication List")
 
-with get_db_session() as db:
-    user_meds = db.query(Medication).filter(Medication.owner_id == user_id).order_by(Medication.name).all()
-
-if not user_meds:
-    st.info("You have not added any medications yet. Use the form above to get started.")
-else:
-    # Use st.session_state to track which medication is being edited
-    if 'editing_med_id' not in st.session_state:
-        st.session_state.editing_med_id = None
-
-    for med in user_meds:
-        # Check if the current medication is the one being edited
-        if st.session_state.editing_med_id == med.id:
-            # --- UPDATE VIEW ---
-            with st.container(border=True):
-                with st.form(key=f"edit_form_{med.id}"):
-                    st.markdown(f"**Editing: {med.name}**")
-                    new_name = st.text_input("Name", value=med.name, key=f"name_{med.id}")
-                    new_dosage = st.text_input("Dosage", value=med.dosage, key=f"dosage_{med.id}")
-                    new_schedule = st.text_input("Schedule", value=med.schedule, key=f"schedule_{med.id}")
-                    
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.form_submit_button("✅ Save Changes"):
-                            with get_db_session() as db_session:
-                                med_to_update = db_session.query(Medication).get(med.id)
-                                med_to_update.name = new_name
-                                med_to_update.dosage = new_dosage
-                                med_to_update.schedule = new_schedule
-                                db_session.commit()
-                            st.session_state.editing_med_id = None
-                            st.success("Medication updated successfully.")
-                            st.rerun()
-                    with col2:
-                        if st.form_submit_button("❌ Cancel", type="secondary"):
-                            st.session_state.editing_med_id = None
-                            st.rerun()
-        else:
-            # --- READ/DELETE VIEW ---
-            with st.container(border=True):
-                col1, col2, col3 = st.columns([4, 1, 1])
-                with col1:
-                    st.markdown(f"**{med.name}**")
-                    st.caption(f"Dosage: {med.dosage} | Schedule: {med.schedule}")
-                    st.caption(f"Started on: {med.start_date.strftime('%Y-%m-%d')}")
-                
-                with col2:
-                    if st.button("✏️ Edit", key=f"edit_{med.id}"):
-                        st.session_state.editing_med_id = med.id
-                        st.rerun()
-
-                with col3:
-                    if st.button("🗑️ Delete", key=f"delete_{med.id}", type="primary"):
-                        with get_db_session() as db_session:
-                            med_to_delete = db_session.query(Medication).get(med.id)
-                            db_session.delete(med_to_delete)
-                            db_session.commit()
-                        st.success(f"'{med.name}' deleted successfully.")
-                        st.rerun()
\ No newline at end of file
+@st.dialog("Edit Medication")
+def edit_medication_dialog(med):
+    """Modal form for editing a single medication."""
+    with st.form("edit_med_form"):
+        st.markdown(f"**Editing: {med['name']}**")
+        new_name = st.text_input("Name", value=med['name'])
+        new_dosage = st.text_input("Dosage", value=med['dosage'])
+        new_schedule = st.text_input("Schedule", value=med['schedule'])
+
+        if st.form_submit_button("✅ Save Changes"):
+            with get_db_session() as db_session:
+                # A single UPDATE; schedule_mask is set here because
+                # bulk statements bypass the model's @validates hook.
+                db_session.execute(
+                    update(Medication)
+                    .where(Medication.id == med['id'], Medication.owner_id == user_id)
+                    .values(
+                        name=new_name,
+                        dosage=new_dosage,
+                        schedule=new_schedule,
+                        schedule_mask=schedule_to_mask(new_schedule),
+                    )
+                )
+                db_session.commit()
+                clear_medication_caches() # Refresh the cached medication list and dashboard
+            st.success("Medication updated successfully.")
+            st.rerun()
+
+@st.fragment
+def medication_list():
+    """
+    Renders the medication table and its actions. Selecting a row or deleting one
+    only reruns this fragment, not the whole page.
+    """
+    user_meds = load_user_meds(user_id)
+    if not user_meds:
+        st.info("You have not added any medications yet. Use the form above to get started.")
+        return
+
+    meds_df = pd.DataFrame(user_meds)
+    # Format all dates in one vectorized pass
+    meds_df["start_str"] = pd.to_datetime(meds_df["start_date"]).dt.strftime('%Y-%m-%d')
+
+    # One table widget for the whole list; the selected rows are the target of Edit/Delete.
+    event = st.dataframe(
+        meds_df,
+        column_order=["name", "dosage", "schedule", "start_str"],
+        column_config={
+            "name": st.column_config.TextColumn("Medication"),
+            "dosage": st.column_config.TextColumn("Dosage"),
+            "schedule": st.column_config.TextColumn("Schedule"),
+            "start_str": st.column_config.TextColumn("Started On"),
+        },
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key="med_table",
+    )
+    selected_meds = [user_meds[i] for i in event.selection.rows]
+
+    col1, col2, _ = st.columns([1, 1, 4])
+    with col1:
+        if st.button("✏️ Edit", disabled=len(selected_meds) != 1, use_container_width=True,
+                     help="Select a single medication to edit"):
+            edit_medication_dialog(selected_meds[0])
+
+    with col2:
+        if st.button("🗑️ Delete", type="primary", disabled=not selected_meds, use_container_width=True):
+            # All selected medications are removed with one DELETE ... WHERE id IN (...)
+            ids = [med['id'] for med in selected_meds]
+            with get_db_session() as db_session:
+                db_session.execute(
+                    delete(Medication)
+                    .where(Medication.owner_id == user_id, Medication.id.in_(ids))
+                )
+                db_session.commit()
+                clear_medication_caches() # Refresh the cached medication list and dashboard
+            st.success(f"Deleted {len(ids)} medication(s) successfully.")
+            st.rerun(scope="fragment")
+
+medication_list()
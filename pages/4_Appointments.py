@@ -2,10 +2,12 @@
 
 
 import streamlit as st
+import pandas as pd
 from datetime import datetime, time
+from sqlalchemy import update, delete
 
 # Import utility functions and database models
-from modules.utils import page_setup, check_login, get_db_session
+from modules.utils import page_setup, check_login, get_db_session, get_current_user_id, load_dashboard_data
 from modules.database import Appointment
 
 # ==============================================================================
@@ -15,11 +17,50 @@ page_setup()
 check_login()
 
 # Get the current user's database ID
-user_id = st.session_state.get("user_db_id")
+user_id = get_current_user_id()
 if not user_id:
     st.error("User not properly logged in. Cannot load appointment data.")
     st.stop()
 
+# Only the columns the list needs, instead of hydrating full ORM objects
+APPT_COLUMNS = (
+    Appointment.id, Appointment.doctor_name, Appointment.specialty,
+    Appointment.appointment_datetime, Appointment.location, Appointment.notes,
+)
+
+# Both loaders are cached across reruns and cleared whenever an appointment is
+# added, edited or deleted. 'now' is passed in (rounded to the minute) so the
+# upcoming/past split stays current without defeating the cache.
+@st.cache_data(ttl=300, show_spinner=False)
+def load_upcoming(user_id, now):
+    """Returns the user's upcoming appointments as plain dicts, soonest first."""
+    with get_db_session() as db:
+        rows = (
+            db.query(*APPT_COLUMNS)
+            .filter(Appointment.owner_id == user_id, Appointment.appointment_datetime >= now)
+            .order_by(Appointment.appointment_datetime.asc())
+            .all()
+        )
+        return [row._asdict() for row in rows]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_past(user_id, now, limit=50):
+    """Returns the user's most recent past appointments as plain dicts, newest first."""
+    with get_db_session() as db:
+        rows = (
+            db.query(*APPT_COLUMNS)
+            .filter(Appointment.owner_id == user_id, Appointment.appointment_datetime < now)
+            .order_by(Appointment.appointment_datetime.desc())
+            .limit(limit)
+            .all()
+        )
+        return [row._asdict() for row in rows]
+
+def clear_appointment_caches():
+    load_upcoming.clear()
+    load_past.clear()
+    load_dashboard_data.clear()
+
 # ==============================================================================
 # 3. ADD NEW APPOINTMENT (CREATE)
 # ==============================================================================
@@ -60,6 +101,7 @@ with st.expander("➕ Add a New Appointment"):
                     )
                     db.add(new_appt)
                     db.commit()
+                    clear_appointment_caches() # Refresh the cached appointment list and dashboard
                 st.success(f"Appointment with {appt_doctor} has been saved.")
                 
 # ==============================================================================
@@ -67,87 +109,107 @@ with st.expander("➕ Add a New Appointment"):
 # ==============================================================================
 st.divider()
 
-# Fetch all appointments and categorize them
-with get_db_session() as db:
-    all_appts = db.query(Appointment).filter(Appointment.owner_id == user_id).order_by(Appointment.appointment_datetime.desc()).all()
-
-now = datetime.now()
-upcoming_appts = [a for a in all_appts if a.appointment_datetime >= now]
-past_appts = [a for a in all_appts if a.appointment_datetime < now]
-
-# --- Display appointments using tabs ---
-tab1, tab2 = st.tabs([f"Upcoming ({len(upcoming_appts)})", f"Past ({len(past_appts)})"])
-
-def display_appointments(appointments):
+@st.dialog("Edit Appointment")
+def edit_appointment_dialog(appt):
+    """Modal form for editing a single appointment."""
+    with st.form("edit_appt_form"):
+        st.markdown(f"**Editing Appointment with: {appt['doctor_name']}**")
+        new_doctor = st.text_input("Doctor's Name", value=appt['doctor_name'])
+        new_specialty = st.text_input("Specialty", value=appt['specialty'])
+        new_date = st.date_input("Date", value=appt['appointment_datetime'].date())
+        new_time = st.time_input("Time", value=appt['appointment_datetime'].time())
+        new_notes = st.text_area("Notes", value=appt['notes'])
+
+        if st.form_submit_button("✅ Save Changes"):
+            with get_db_session() as db_session:
+                new_datetime = datetime.combine(new_date, new_time)
+                values = dict(
+                    doctor_name=new_doctor,
+                    specialty=new_specialty,
+                    appointment_datetime=new_datetime,
+                    notes=new_notes,
+                )
+                if new_datetime != appt['appointment_datetime']:
+                    # Rescheduled, so the reminder should be sent again
+                    values["last_reminder_sent"] = None
+                db_session.execute(
+                    update(Appointment)
+                    .where(Appointment.id == appt['id'], Appointment.owner_id == user_id)
+                    .values(**values)
+                )
+                db_session.commit()
+                clear_appointment_caches() # Refresh the cached appointment list and dashboard
+            st.success("Appointment updated successfully.")
+            st.rerun()
+
+def display_appointments(appointments, key):
     """Helper function to display a list of appointments."""
     if not appointments:
         st.info("No appointments in this category.")
         return
 
-    # Use session state to track which appointment is being edited
-    if 'editing_appt_id' not in st.session_state:
-        st.session_state.editing_appt_id = None
-
-    for appt in appointments:
-        if st.session_state.editing_appt_id == appt.id:
-            # --- UPDATE VIEW ---
-            with st.container(border=True):
-                with st.form(key=f"edit_form_{appt.id}"):
-                    st.markdown(f"**Editing Appointment with: {appt.doctor_name}**")
-                    new_doctor = st.text_input("Doctor's Name", value=appt.doctor_name, key=f"doc_{appt.id}")
-                    new_specialty = st.text_input("Specialty", value=appt.specialty, key=f"spec_{appt.id}")
-                    new_date = st.date_input("Date", value=appt.appointment_datetime.date(), key=f"date_{appt.id}")
-                    new_time = st.time_input("Time", value=appt.appointment_datetime.time(), key=f"time_{appt.id}")
-                    new_notes = st.text_area("Notes", value=appt.notes, key=f"notes_{appt.id}")
-
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.form_submit_button("✅ Save Changes"):
-                            with get_db_session() as db_session:
-                                appt_to_update = db_session.query(Appointment).get(appt.id)
-                                appt_to_update.doctor_name = new_doctor
-                                appt_to_update.specialty = new_specialty
-                                appt_to_update.appointment_datetime = datetime.combine(new_date, new_time)
-                                appt_to_update.notes = new_notes
-                                db_session.commit()
-                            st.session_state.editing_appt_id = None
-                            st.success("Appointment updated successfully.")
-                            st.rerun()
-                    with col2:
-                        if st.form_submit_button("❌ Cancel"):
-                            st.session_state.editing_appt_id = None
-                            st.rerun()
-        else:
-            # --- READ/DELETE VIEW ---
-            with st.container(border=True):
-                col1, col2, col3 = st.columns([4, 1, 1])
-                with col1:
-                    st.markdown(f"**{appt.doctor_name}** ({appt.specialty})")
-                    st.markdown(f"**When:** {appt.appointment_datetime.strftime('%A, %B %d, %Y at %I:%M %p')}")
-                    st.caption(f"Location: {appt.location}" if appt.location else "No location specified")
-                    if appt.notes:
-                        with st.expander("View Notes"):
-                            st.write(appt.notes)
-                
-                with col2:
-                    if st.button("✏️ Edit", key=f"edit_{appt.id}"):
-                        st.session_state.editing_appt_id = appt.id
-                        st.rerun()
-                
-                with col3:
-                    if st.button("🗑️ Delete", key=f"delete_{appt.id}", type="primary"):
-                        with get_db_session() as db_session:
-                            appt_to_delete = db_session.query(Appointment).get(appt.id)
-                            db_session.delete(appt_to_delete)
-                            db_session.commit()
-                        st.success(f"Appointment with {appt.doctor_name} deleted.")
-                        st.rerun()
-
-# Call the display function for each tab
-with tab1:
-    st.subheader("Your Upcoming Appointments")
-    display_appointments(upcoming_appts)
-
-with tab2:
-    st.subheader("Your Past Appointments")
-    display_appointments(past_appts)
\ No newline at end of file
+    appts_df = pd.DataFrame(appointments)
+    # Format all dates in one vectorized pass
+    appts_df["when_str"] = appts_df["appointment_datetime"].dt.strftime('%A, %B %d, %Y at %I:%M %p')
+
+    # One table widget for the whole list; the selected rows are the target of Edit/Delete.
+    event = st.dataframe(
+        appts_df,
+        column_order=["when_str", "doctor_name", "specialty", "location", "notes"],
+        column_config={
+            "when_str": st.column_config.TextColumn("When"),
+            "doctor_name": st.column_config.TextColumn("Doctor"),
+            "specialty": st.column_config.TextColumn("Specialty"),
+            "location": st.column_config.TextColumn("Location"),
+            "notes": st.column_config.TextColumn("Notes"),
+        },
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=f"{key}_table",
+    )
+    selected_appts = [appointments[i] for i in event.selection.rows]
+
+    col1, col2, _ = st.columns([1, 1, 4])
+    with col1:
+        if st.button("✏️ Edit", key=f"{key}_edit", disabled=len(selected_appts) != 1, use_container_width=True,
+                     help="Select a single appointment to edit"):
+            edit_appointment_dialog(selected_appts[0])
+
+    with col2:
+        if st.button("🗑️ Delete", key=f"{key}_delete", type="primary", disabled=not selected_appts, use_container_width=True):
+            # All selected appointments are removed with one DELETE ... WHERE id IN (...)
+            ids = [appt['id'] for appt in selected_appts]
+            with get_db_session() as db_session:
+                db_session.execute(
+                    delete(Appointment)
+                    .where(Appointment.owner_id == user_id, Appointment.id.in_(ids))
+                )
+                db_session.commit()
+                clear_appointment_caches() # Refresh the cached appointment list and dashboard
+            st.success(f"Deleted {len(ids)} appointment(s).")
+            st.rerun(scope="fragment")
+
+@st.fragment
+def appointment_list():
+    """
+    Renders the selected category of appointments. Switching category, selecting
+    a row or deleting one only reruns this fragment, not the whole page.
+    """
+    now = datetime.now().replace(second=0, microsecond=0)
+
+    # --- Choose which appointments to display ---
+    # Only the selected category is queried; the past list is never loaded unless viewed.
+    view = st.radio("Show", ["Upcoming", "Past"], horizontal=True, key="appt_view", label_visibility="collapsed")
+
+    # Call the display function for the selected category
+    if view == "Upcoming":
+        st.subheader("Your Upcoming Appointments")
+        display_appointments(load_upcoming(user_id, now), key="upcoming")
+    else:
+        st.subheader("Your Past Appointments")
+        st.caption("Showing your 50 most recent past appointments.")
+        display_appointments(load_past(user_id, now), key="past")
+
+appointment_list()
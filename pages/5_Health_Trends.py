@@ -10,11 +10,11 @@ It uses Pandas for data manipulation and Plotly for interactive charts.
 # ==============================================================================
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from datetime import datetime
+from sqlalchemy import delete, select
 
 # Import utility functions and database models
-from modules.utils import page_setup, check_login, get_db_session
+from modules.utils import page_setup, check_login, get_db_session, get_current_user_id
 from modules.database import HealthVital
 
 # ==============================================================================
@@ -24,7 +24,7 @@ page_setup()
 check_login()
 
 # Get the current user's database ID
-user_id = st.session_state.get("user_db_id")
+user_id = get_current_user_id()
 if not user_id:
     st.error("User not properly logged in. Cannot load health data.")
     st.stop()
@@ -36,6 +36,83 @@ st.title("📈 Health Trends")
 st.write("Log your health metrics and visualize your progress over time.")
 
 VITAL_TYPES = ["Blood Pressure", "Blood Sugar", "Weight", "Heart Rate"]
+PANDAS_2 = int(pd.__version__.split(".")[0]) >= 2
+
+# Both loaders are cached across reruns and cleared whenever a log is added or deleted.
+@st.cache_data(ttl=300, show_spinner=False)
+def list_vital_types(user_id):
+    """Returns the distinct vital types the user has logged, for the selectbox."""
+    with get_db_session() as db:
+        rows = (
+            db.query(HealthVital.vital_type)
+            .filter(HealthVital.owner_id == user_id)
+            .distinct()
+            .order_by(HealthVital.vital_type)
+            .all()
+        )
+        return [row.vital_type for row in rows]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_vital_series(user_id, vital_type):
+    """
+    Returns the user's logs for one vital type as a DataFrame, oldest first.
+    Only the selected series is fetched, not every vital the user has logged.
+    """
+    # Select only the columns the page uses
+    stmt = (
+        select(
+            HealthVital.id, HealthVital.record_date,
+            HealthVital.value1, HealthVital.value2, HealthVital.unit,
+        )
+        .where(HealthVital.owner_id == user_id, HealthVital.vital_type == vital_type)
+        .order_by(HealthVital.record_date.asc())
+    )
+    # Arrow-backed columns (pandas 2.x) use less memory than NumPy object columns
+    read_kwargs = {"dtype_backend": "pyarrow"} if PANDAS_2 else {}
+    with get_db_session() as db:
+        return pd.read_sql(stmt, db.connection(), parse_dates=["record_date"], **read_kwargs)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def build_vital_fig(user_id, vital_type):
+    """
+    Builds the trend chart for one vital type. Cached with the series, so
+    repeat views skip both the Plotly import and the figure construction.
+    """
+    import plotly.express as px
+
+    plot_df = load_vital_series(user_id, vital_type)
+    # Create the plot using Plotly Express
+    if vital_type == "Blood Pressure":
+        fig = px.line(plot_df, x='record_date', y=['value1', 'value2'],
+                      title=f'{vital_type} Trend', markers=True)
+        # Update trace names for clarity
+        fig.data[0].name = 'Systolic'
+        fig.data[1].name = 'Diastolic'
+        fig.update_layout(yaxis_title='mmHg')
+    else:
+        fig = px.line(plot_df, x='record_date', y='value1',
+                      title=f'{vital_type} Trend ({plot_df["unit"].iloc[0]})', markers=True)
+        fig.update_layout(yaxis_title=plot_df["unit"].iloc[0])
+    return fig
+
+def clear_vital_caches():
+    list_vital_types.clear()
+    load_vital_series.clear()
+    build_vital_fig.clear()
+
+BULK_INSERT_CHUNK_SIZE = 2000
+
+def bulk_add_vitals(user_id, rows):
+    """
+    Inserts many health logs in a single transaction, in chunks of
+    BULK_INSERT_CHUNK_SIZE rows, instead of one INSERT and commit per log.
+    """
+    with get_db_session() as db:
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            chunk = rows[start:start + BULK_INSERT_CHUNK_SIZE]
+            db.bulk_insert_mappings(HealthVital, [dict(owner_id=user_id, **row) for row in chunk])
+        db.commit()
+    clear_vital_caches()
 
 with st.expander("➕ Add a New Health Log"):
     with st.form("new_vital_form", clear_on_submit=True):
@@ -75,9 +152,64 @@ with st.expander("➕ Add a New Health Log"):
                     )
                     db.add(new_vital)
                     db.commit()
+                clear_vital_caches()
                 st.success(f"{vital_type} log saved successfully.")
             else:
                 st.warning("Please enter a valid value greater than 0.")
+
+with st.expander("📥 Import Health Logs from CSV"):
+    with st.form("import_vitals_form", clear_on_submit=True):
+        st.write(
+            "Upload a CSV with the columns `vital_type`, `value1`, `value2` (optional), "
+            f"`unit` and `record_date`. Valid vital types: {', '.join(VITAL_TYPES)}. "
+            "See `assets/sample_health_logs.csv` for an example."
+        )
+        csv_file = st.file_uploader("CSV file", type=["csv"])
+        imported = st.form_submit_button("Import Logs")
+
+        if imported and csv_file:
+            try:
+                import_df = pd.read_csv(csv_file)
+                if "value2" not in import_df:
+                    import_df["value2"] = None
+                import_df = import_df[["vital_type", "value1", "value2", "unit", "record_date"]].copy()
+                # Coerce rather than trust the file: bad numbers become NaN and bad dates NaT
+                raw_dates = import_df["record_date"]
+                import_df["value1"] = pd.to_numeric(import_df["value1"], errors="coerce")
+                import_df["value2"] = pd.to_numeric(import_df["value2"], errors="coerce")
+                # Parse each date on its own (pandas 2.x otherwise infers one format from the
+                # first row), so date-only and date-time values can be mixed in one file
+                date_kwargs = {"format": "mixed"} if PANDAS_2 else {}
+                import_df["record_date"] = pd.to_datetime(raw_dates, errors="coerce", **date_kwargs)
+                valid = (
+                    import_df["vital_type"].isin(VITAL_TYPES)
+                    & (import_df["value1"] > 0)
+                    # A date that was given but couldn't be parsed is an error, not "today"
+                    & ~(import_df["record_date"].isna() & raw_dates.notna())
+                    # Blood pressure needs both the systolic and diastolic reading
+                    & ((import_df["vital_type"] != "Blood Pressure") | import_df["value2"].notna())
+                )
+                skipped = int((~valid).sum())
+                import_df = import_df[valid]
+                # NaN -> None so SQLite stores NULLs; rows without a date fall back to the server default
+                rows = [
+                    {key: value for key, value in row.items() if not (key == "record_date" and value is None)}
+                    for row in import_df.astype(object).where(import_df.notna(), None).to_dict("records")
+                ]
+            except (ValueError, KeyError, TypeError) as e:
+                st.error(f"Could not read the CSV file. Error: {e}")
+            else:
+                if skipped:
+                    st.warning(f"Skipped {skipped} row(s) with an unknown vital type, a missing or invalid value, or an invalid date.")
+                if rows:
+                    try:
+                        bulk_add_vitals(user_id, rows)
+                    except Exception as e:
+                        st.error(f"An error occurred while saving the imported logs. Error: {e}")
+                    else:
+                        st.success(f"Imported {len(rows)} health log(s).")
+                else:
+                    st.warning("No valid rows found in the CSV file.")
                 
 # ==============================================================================
 # 4. VISUALIZE TRENDS (READ)
@@ -85,53 +217,67 @@ with st.expander("➕ Add a New Health Log"):
 st.divider()
 st.subheader("Visualize Your Trends")
 
-with get_db_session() as db:
-    # Query all vitals and convert to a Pandas DataFrame
-    vitals_query = db.query(HealthVital).filter(HealthVital.owner_id == user_id).order_by(HealthVital.record_date.asc())
-    df = pd.read_sql(vitals_query.statement, db.bind)
+@st.fragment
+def vital_trends():
+    """
+    Renders the chart and log history for one vital type. Switching vitals or
+    deleting a log only reruns this fragment, not the whole page.
+    """
+    available_vitals = list_vital_types(user_id)
+
+    if not available_vitals:
+        st.info("You haven't logged any health data yet. Add a log above to see your trends.")
+        return
 
-if df.empty:
-    st.info("You haven't logged any health data yet. Add a log above to see your trends.")
-else:
     # Let user select which vital to plot
-    available_vitals = df['vital_type'].unique()
     selected_vital = st.selectbox("Select a vital to visualize:", options=available_vitals)
 
-    plot_df = df[df['vital_type'] == selected_vital].copy()
-    plot_df['record_date'] = pd.to_datetime(plot_df['record_date'])
+    # Only the selected series is loaded; 'record_date' is already parsed by read_sql
+    plot_df = load_vital_series(user_id, selected_vital)
     
-    # Create the plot using Plotly Express
-    if selected_vital == "Blood Pressure":
-        fig = px.line(plot_df, x='record_date', y=['value1', 'value2'],
-                      title=f'{selected_vital} Trend', markers=True)
-        # Update trace names for clarity
-        fig.data[0].name = 'Systolic'
-        fig.data[1].name = 'Diastolic'
-        fig.update_layout(yaxis_title='mmHg')
-    else:
-        fig = px.line(plot_df, x='record_date', y='value1',
-                      title=f'{selected_vital} Trend ({plot_df["unit"].iloc[0]})', markers=True)
-        fig.update_layout(yaxis_title=plot_df["unit"].iloc[0])
-
+    fig = build_vital_fig(user_id, selected_vital)
     st.plotly_chart(fig, use_container_width=True)
     
     # --- Data Table and Deletion ---
     st.subheader(f"Log History for {selected_vital}")
-    with st.container():
-        for index, row in plot_df.sort_values('record_date', ascending=False).iterrows():
-            col1, col2 = st.columns([5, 1])
-            with col1:
-                if selected_vital == "Blood Pressure":
-                    val_str = f"{int(row.value1)} / {int(row.value2)} {row.unit}"
-                else:
-                    val_str = f"{row.value1} {row.unit}"
-                
-                st.markdown(f"**{row.record_date.strftime('%Y-%m-%d')}**: {val_str}")
-            with col2:
-                if st.button("🗑️", key=f"delete_vital_{row.id}", help="Delete this log entry"):
-                    with get_db_session() as db_session:
-                        vital_to_delete = db_session.query(HealthVital).get(row.id)
-                        db_session.delete(vital_to_delete)
-                        db_session.commit()
-                    st.success("Log entry deleted.")
-                    st.rerun()
\ No newline at end of file
+    history_df = plot_df.sort_values('record_date', ascending=False).reset_index(drop=True)
+    # Build the display strings with vectorized pandas operations rather than per row
+    history_df['date_str'] = history_df['record_date'].dt.strftime('%Y-%m-%d')
+    unit_str = " " + history_df['unit'].astype(str)
+    if selected_vital == "Blood Pressure":
+        # Nullable Int64 so a missing reading shows as a dash instead of raising
+        sys_str = history_df['value1'].round().astype("Int64").astype("string").fillna("–")
+        dia_str = history_df['value2'].round().astype("Int64").astype("string").fillna("–")
+        history_df['val_str'] = sys_str + " / " + dia_str + unit_str
+    else:
+        history_df['val_str'] = history_df['value1'].astype(str) + unit_str
+    # One table widget for the whole history; the selected rows are the target of Delete.
+    event = st.dataframe(
+        history_df,
+        column_order=["date_str", "val_str"],
+        column_config={
+            "date_str": st.column_config.TextColumn("Date"),
+            "val_str": st.column_config.TextColumn("Value"),
+        },
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key="vital_table",
+    )
+    selected_rows = event.selection.rows
+
+    if st.button("🗑️ Delete Selected", type="primary", disabled=not selected_rows, help="Delete the selected log entries"):
+        # All selected entries are removed with one DELETE ... WHERE id IN (...)
+        ids = [int(vital_id) for vital_id in history_df["id"].iloc[selected_rows]]
+        with get_db_session() as db_session:
+            db_session.execute(
+                delete(HealthVital)
+                .where(HealthVital.owner_id == user_id, HealthVital.id.in_(ids))
+            )
+            db_session.commit()
+        clear_vital_caches()
+        st.success(f"Deleted {len(ids)} log entr{'y' if len(ids) == 1 else 'ies'}.")
+        st.rerun(scope="fragment")
+
+vital_trends()